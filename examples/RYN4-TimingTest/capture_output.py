@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import codecs
 import serial
 import time
 import sys
@@ -6,21 +7,52 @@ import sys
 def capture_serial(port='/dev/ttyACM0', baudrate=115200, duration=30):
     """Capture serial output for specified duration"""
     try:
-        ser = serial.Serial(port, baudrate, timeout=1)
+        # Short timeout so bulk reads return promptly when the line goes quiet
+        ser = serial.Serial(port, baudrate, timeout=0.05)
         print(f"Connected to {port} at {baudrate} baud")
         print("-" * 60)
-        
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            if ser.in_waiting:
-                line = ser.readline()
-                try:
-                    decoded = line.decode('utf-8', errors='replace').strip()
+
+        # Captured lines bypass the text layer and are written in batches
+        sys.stdout.flush()
+        out = sys.stdout.buffer
+        pending = []
+        last_flush = 0.0
+
+        # Decode whole chunks; the incremental decoder keeps multibyte
+        # sequences that straddle a read boundary intact
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        text_buf = ''
+        last_rx = 0.0
+        start_time = time.monotonic()
+        try:
+            while time.monotonic() - start_time < duration:
+                # Take whatever is already buffered; block for one byte only when idle
+                chunk = ser.read(ser.in_waiting or 1)
+                # Stamp lines when their data arrived, not when the read started
+                elapsed = time.monotonic() - start_time
+                if chunk:
+                    text_buf += decoder.decode(chunk)
+                    last_rx = elapsed
+                *lines, text_buf = text_buf.split('\n')
+                for line in lines:
+                    decoded = line.strip()
                     if decoded:
-                        print(f"[{time.time() - start_time:6.2f}] {decoded}")
-                except Exception as e:
-                    print(f"[{time.time() - start_time:6.2f}] Raw: {line.hex()}")
-        
+                        pending.append(f"[{elapsed:6.2f}] {decoded}\n".encode())
+
+                if pending and (len(pending) >= 32 or elapsed - last_flush > 0.1):
+                    out.write(b''.join(pending))
+                    out.flush()
+                    pending.clear()
+                    last_flush = elapsed
+        finally:
+            # Write out everything captured so far, also when the port fails
+            # mid-capture or the user presses Ctrl+C
+            decoded = (text_buf + decoder.decode(b'', final=True)).strip()
+            if decoded:
+                pending.append(f"[{last_rx:6.2f}] {decoded}\n".encode())
+            out.write(b''.join(pending))
+            out.flush()
+
         print("-" * 60)
         print(f"Capture complete after {duration} seconds")
         ser.close()
@@ -29,4 +61,4 @@ def capture_serial(port='/dev/ttyACM0', baudrate=115200, duration=30):
         sys.exit(1)
 
 if __name__ == "__main__":
-    capture_serial()
\ No newline at end of file
+    capture_serial()
@@ -7,69 +7,211 @@ Based on the successful RYN4 splitting pattern
 import re
 import os
 import sys
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Pattern to match MB8ART method definitions. The return type ends in a single
+# [\s*&]+ class and the trailing qualifiers share one repeated group, so no two
+# parts of the pattern can compete for the same characters. Template arguments
+# cannot cross ';', '{' or '}', which keeps them inside one declaration.
+_METHOD_RE = re.compile(
+    rb'(?P<ret>(?:[\w:]+(?:<[^>;{}]+>)?[\s*&]+)?)'
+    rb'(?P<name>MB8ART::\w+)[ \t]*\([^)]*\)'
+    rb'(?:\s*(?:const|noexcept|override)\b)*\s*\{'
+)
+# A line holding only a return type, for definitions that put the name on the next line
+_RETURN_TYPE_LINE_RE = re.compile(rb'[ \t]*[\w:]+(?:<[^>;{}]+>)?[ \t*&\r]*$')
+# Blank or comment line: optional indentation, then '//', '/*' or end of line
+_COMMENT_LINE_RE = re.compile(rb'[ \t\r\f\v]*(?://|/\*|$)')
+# Literal every method definition must contain; used to skip the regex elsewhere
+_METHOD_PREFIX = b'MB8ART::'
+
+# Method names with a fixed target file, checked before the keyword rules
+_EXACT_TARGETS = {
+    **dict.fromkeys((
+        'initialize', 'getDeviceType', 'getStatus', 'getLastError',
+        'performSelfTest', 'requestData', 'processData', 'getData',
+        'waitForInitializationComplete', 'performAction', 'waitForData',
+        'waitForInitialization', 'registerCallback', 'unregisterCallbacks',
+        'setEventNotification'
+    ), 'MB8ARTDevice.cpp'),
+    **dict.fromkeys(('printSensorStatus', 'printModuleSettings'), 'MB8ARTState.cpp'),
+}
+
+# Keyword rules in priority order; each keyword list is one compiled alternation
+_CATEGORY_RULES = (
+    # Modbus/communication methods
+    (re.compile(r'(?i:modbus|response|handle|validate)|onAsync|readSensor|readAll|sendRequest'),
+     'MB8ARTModbus.cpp'),
+    # State query methods
+    (re.compile(r'^(?:is|get|was|check)(?!.*(?:Event|Bit|Enum))'), 'MB8ARTState.cpp'),
+    # Configuration methods
+    (re.compile(r'set|req|initializeModule|Settings|BaudRate|Parity|Address|Factory|'
+                r'ToString|Enum|Stored'), 'MB8ARTConfig.cpp'),
+    # Event methods
+    (re.compile(r'Event|Bit|notification'), 'MB8ARTEvents.cpp'),
+    # Sensor-specific methods
+    (re.compile(r'Sensor|sensor|Mapping|mapping|process|control|measure'), 'MB8ARTSensor.cpp'),
+)
+
+_FILE_DESCRIPTIONS = {
+    'MB8ARTDevice.cpp': 'IDeviceInstance interface implementation',
+    'MB8ARTModbus.cpp': 'Modbus communication and response handling',
+    'MB8ARTState.cpp': 'State query and status methods',
+    'MB8ARTConfig.cpp': 'Configuration and settings management',
+    'MB8ARTEvents.cpp': 'Event group and notification handling',
+    'MB8ARTSensor.cpp': 'Sensor-specific operations and mappings'
+}
+
+def create_file_header(filename, description):
+    """Create standard file header"""
+    return f'''/**
+ * @file {filename}
+ * @brief {description}
+ * 
+ * This file contains {description.lower()} for the MB8ART library.
+ */
+
+#include "MB8ART.h"
+#include <MutexGuard.h>
+
+'''.encode()
+
+# Headers for the known split files, formatted once
+_HEADERS = {
+    filename: create_file_header(filename, description)
+    for filename, description in _FILE_DESCRIPTIONS.items()
+}
+
+# Additional includes needed by specific split files
+_EXTRA_INCLUDES = {
+    'MB8ARTConfig.cpp': b'#include <RetryPolicy.h>\n',
+    'MB8ARTDevice.cpp': b'#include <string.h>\n',
+    'MB8ARTSensor.cpp': b'#include <algorithm>\n',
+}
+
+def _write_all(path, data):
+    """Write bytes to path with raw os.write calls, bypassing buffered file objects"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            written += os.write(fd, view[written:])
+    finally:
+        os.close(fd)
+
+def _find_body_end(content, pos):
+    """Return the offset past a method body's closing brace and line ending, or -1"""
+    depth = 1
+    next_open = content.find(b'{', pos)
+    next_close = content.find(b'}', pos)
+    # Each brace is located once: a cached position stays valid until consumed
+    while True:
+        if next_close == -1:
+            return -1
+        if 0 <= next_open < next_close:
+            depth += 1
+            next_open = content.find(b'{', next_open + 1)
+        else:
+            depth -= 1
+            pos = next_close + 1
+            if depth == 0:
+                break
+            next_close = content.find(b'}', pos)
+    
+    # Include the line ending(s) after the closing brace
+    content_len = len(content)
+    while pos < content_len and (content[pos] == 0x0A or content[pos] == 0x0D):
+        pos += 1
+    return pos
+
+def _collapse_blank_lines(data):
+    """Collapse runs of three or more newlines to two in a single pass"""
+    out = bytearray()
+    pos = 0
+    while (i := data.find(b'\n\n\n', pos)) != -1:
+        out += data[pos:i + 2]
+        pos = i + 3
+        while pos < len(data) and data[pos] == 0x0A:
+            pos += 1
+    out += data[pos:]
+    return out
+
 class MB8ARTSplitter:
     def __init__(self, source_path):
         self.source_path = Path(source_path)
         self.source_dir = self.source_path.parent
-        self.content = self.source_path.read_text()
+        # Work on the raw bytes; every pattern below is ASCII. Line endings are
+        # normalized to LF once, as text mode did, so generated parts and bodies agree
+        self.content = self.source_path.read_bytes().replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        # Zero-copy view for slicing out method bodies; bytes.join accepts it directly
+        self._view = memoryview(self.content)
+        self._nl = self._build_line_index(self.content)
         self.methods = []
         self.categorized = {}
         
+    @staticmethod
+    def _build_line_index(content):
+        """Return newline offsets, prefixed with -1 so line k starts at index[k] + 1"""
+        index = array('i', [-1])
+        pos = content.find(b'\n')
+        while pos != -1:
+            index.append(pos)
+            pos = content.find(b'\n', pos + 1)
+        return index
+        
     def categorize_method(self, method_name, return_type, full_signature):
         """Categorize a method based on RYN4 patterns adapted for MB8ART"""
         
-        # IDeviceInstance methods
-        if 'IDeviceInstance::' in return_type or method_name in [
-            'initialize', 'getDeviceType', 'getStatus', 'getLastError',
-            'performSelfTest', 'requestData', 'processData', 'getData',
-            'waitForInitializationComplete', 'performAction', 'waitForData',
-            'waitForInitialization', 'registerCallback', 'unregisterCallbacks',
-            'setEventNotification'
-        ]:
+        # IDeviceInstance methods and other explicitly assigned names
+        if 'IDeviceInstance::' in return_type:
             return 'MB8ARTDevice.cpp'
+        target = _EXACT_TARGETS.get(method_name)
+        if target:
+            return target
         
-        # Modbus/communication methods
-        if any(x in method_name.lower() for x in ['modbus', 'response', 'handle', 'validate']) or \
-           any(x in method_name for x in ['onAsync', 'readSensor', 'readAll', 'sendRequest']):
-            return 'MB8ARTModbus.cpp'
-        
-        # State query methods
-        if (method_name.startswith(('is', 'get', 'was', 'check')) and 
-            not any(x in method_name for x in ['Event', 'Bit', 'Enum'])) or \
-           method_name in ['printSensorStatus', 'printModuleSettings']:
-            return 'MB8ARTState.cpp'
-        
-        # Configuration methods
-        if any(x in method_name for x in ['set', 'req', 'initializeModule', 'Settings', 
-                                          'BaudRate', 'Parity', 'Address', 'Factory', 
-                                          'ToString', 'Enum', 'Stored']):
-            return 'MB8ARTConfig.cpp'
-        
-        # Event methods
-        if any(x in method_name for x in ['Event', 'Bit', 'notification']):
-            return 'MB8ARTEvents.cpp'
-        
-        # Sensor-specific methods
-        if any(x in method_name for x in ['Sensor', 'sensor', 'Mapping', 'mapping',
-                                          'process', 'control', 'measure']):
-            return 'MB8ARTSensor.cpp'
+        # First matching keyword rule wins
+        for rule, target in _CATEGORY_RULES:
+            if rule.search(method_name):
+                return target
         
         # Keep in main file
         return 'MB8ART.cpp'
     
     def find_all_methods(self):
         """Find all method implementations in the source file"""
-        # Pattern to match MB8ART method definitions
-        pattern = r'((?:[\w:]+(?:\s*<[^>]+>)?(?:\s+|\s*\*\s*))?)(MB8ART::[\w]+)\s*\([^)]*\)\s*(?:const\s*)?(?:noexcept\s*)?(?:override\s*)?\s*\{'
-        
-        for match in re.finditer(pattern, self.content):
-            return_type = match.group(1).strip() if match.group(1) else ''
-            full_method = match.group(2)
+        content = self.content
+        pos = 0
+        last_end = 0
+        while (i := content.find(_METHOD_PREFIX, pos)) != -1:
+            # Only run the regex on the candidate line up to the first opening brace,
+            # never before the end of a definition already found on the same line
+            line_start = content.rfind(b'\n', 0, i) + 1
+            brace = content.find(b'{', i)
+            if brace == -1:
+                break
+            window_start = max(line_start, last_end)
+            # The return type may sit alone on the previous line
+            if window_start == line_start > 0 and not content[line_start:i].strip():
+                prev_start = content.rfind(b'\n', 0, line_start - 1) + 1
+                if prev_start >= last_end and _RETURN_TYPE_LINE_RE.match(content, prev_start, line_start - 1):
+                    window_start = prev_start
+            match = _METHOD_RE.search(content, window_start, brace + 1)
+            if match is None or match.start('name') != i:
+                pos = i + len(_METHOD_PREFIX)
+                continue
+            pos = last_end = match.end()
+            
+            return_type = match.group('ret').strip().decode()
+            full_method = match.group('name').decode()
             method_name = full_method.replace('MB8ART::', '')
             
-            target_file = self.categorize_method(method_name, return_type, match.group(0))
+            target_file = self.categorize_method(method_name, return_type, match.group(0).decode())
             
             self.methods.append({
                 'name': method_name,
@@ -96,102 +238,74 @@ class MB8ARTSplitter:
         
         # Find preceding comments
         comment_start = start
-        lines = self.content[:start].split('\n')
-        for i in range(len(lines) - 1, -1, -1):
-            line = lines[i].strip()
-            if line.startswith('//') or line == '' or line.startswith('/*'):
-                if i > 0:
-                    comment_start = len('\n'.join(lines[:i]))
-            else:
-                break
+        i = bisect_left(self._nl, start) - 1
+        line_end = start
+        while i >= 0 and _COMMENT_LINE_RE.match(self.content, self._nl[i] + 1, line_end):
+            if i > 0:
+                comment_start = self._nl[i]
+            line_end = self._nl[i]
+            i -= 1
+        # Remove exactly the lines that are copied: comment_start is the newline
+        # before the first extracted line, so removal begins just after it
+        impl_start = comment_start + 1 if comment_start < start else start
         
         # Find matching closing brace
-        brace_count = 1
-        pos = method['signature_end']
+        pos = _find_body_end(self.content, method['signature_end'])
+        if pos == -1:
+            return None
+        method['impl_start'] = impl_start
+        method['impl_end'] = pos
+        return self._view[comment_start:pos]
+    
+    def _build_and_write_file(self, item):
+        """Assemble one split file and write it; safe to run in a worker thread"""
+        filename, methods = item
+        filepath = self.source_dir / filename
         
-        while pos < len(self.content) and brace_count > 0:
-            if self.content[pos] == '{':
-                brace_count += 1
-            elif self.content[pos] == '}':
-                brace_count -= 1
-            pos += 1
+        # Collect file content in parts and join once
+        header = _HEADERS.get(filename) or create_file_header(filename, 'Implementation')
+        parts = [header]
         
-        if brace_count == 0:
-            # Include the newline after the closing brace
-            while pos < len(self.content) and self.content[pos] in '\n':
-                pos += 1
-            return self.content[comment_start:pos]
+        # Add any specific includes based on file type
+        parts.append(_EXTRA_INCLUDES.get(filename, b''))
+        parts.append(b'\nusing namespace mb8art;\n\n')
         
-        return None
-    
-    def create_file_header(self, filename, description):
-        """Create standard file header"""
-        return f'''/**
- * @file {filename}
- * @brief {description}
- * 
- * This file contains {description.lower()} for the MB8ART library.
- */
-
-#include "MB8ART.h"
-#include <MutexGuard.h>
+        # Add static definitions if needed
+        if filename == 'MB8ARTDevice.cpp':
+            parts.append(b'''// Static member definitions
+IDeviceInstance::DataResult MB8ART::cachedSensorResult;
+TickType_t MB8ART::cacheTimestamp;
+const TickType_t MB8ART::CACHE_VALIDITY = pdMS_TO_TICKS(1000); // 1 second cache validity
 
-'''
+''')
+        
+        # Add method implementations
+        for method in methods:
+            impl = self.extract_method_implementation(method)
+            if impl:
+                parts.append(impl)
+                parts.append(b'\n')
+        
+        # Write file
+        _write_all(filepath, b''.join(parts))
+        return filename
     
     def create_split_files(self):
         """Create the new split files"""
-        file_descriptions = {
-            'MB8ARTDevice.cpp': 'IDeviceInstance interface implementation',
-            'MB8ARTModbus.cpp': 'Modbus communication and response handling',
-            'MB8ARTState.cpp': 'State query and status methods',
-            'MB8ARTConfig.cpp': 'Configuration and settings management',
-            'MB8ARTEvents.cpp': 'Event group and notification handling',
-            'MB8ARTSensor.cpp': 'Sensor-specific operations and mappings'
-        }
+        split_files = [(filename, methods) for filename, methods in self.categorized.items()
+                       if filename != 'MB8ART.cpp']
+        if not split_files:
+            return []
         
-        created_files = []
-        
-        for filename, methods in self.categorized.items():
-            if filename == 'MB8ART.cpp':
-                continue
-                
-            filepath = self.source_dir / filename
-            
-            # Create file content
-            content = self.create_file_header(filename, file_descriptions.get(filename, 'Implementation'))
-            
-            # Add any specific includes based on file type
-            if 'Config' in filename:
-                content += '#include <RetryPolicy.h>\n'
-            if 'Device' in filename:
-                content += '#include <string.h>\n'
-            if 'Sensor' in filename:
-                content += '#include <algorithm>\n'
-                
-            content += '\nusing namespace mb8art;\n\n'
-            
-            # Add static definitions if needed
-            if filename == 'MB8ARTDevice.cpp':
-                content += '''// Static member definitions
-IDeviceInstance::DataResult MB8ART::cachedSensorResult;
-TickType_t MB8ART::cacheTimestamp;
-const TickType_t MB8ART::CACHE_VALIDITY = pdMS_TO_TICKS(1000); // 1 second cache validity
-
-'''
-            
-            # Add method implementations
+        # Report from the main thread so output order stays deterministic
+        for filename, methods in split_files:
             print(f"\nCreating {filename} with {len(methods)} methods:")
             for method in methods:
                 print(f"  - {method['name']}()")
-                impl = self.extract_method_implementation(method)
-                if impl:
-                    content += impl + '\n'
-            
-            # Write file
-            filepath.write_text(content)
-            created_files.append(filename)
-            
-        return created_files
+        
+        # Files are independent, so build and write them in parallel
+        with ThreadPoolExecutor(max_workers=min(8, len(split_files))) as executor:
+            return list(executor.map(self._build_and_write_file, split_files))
     
     def update_library_json(self):
         """Update library.json with new source files"""
@@ -216,11 +330,36 @@ const TickType_t MB8ART::CACHE_VALIDITY = pdMS_TO_TICKS(1000); // 1 second cache
             else:
                 print("Warning: srcFilter not found in library.json - please add manually")
             
-            lib_json_path.write_text(content)
+            _write_all(lib_json_path, content.encode())
             print("\nUpdated library.json with new source files")
     
+    def remove_moved_methods_inplace(self, names=None):
+        """Remove moved methods from the source file using the offsets found while parsing"""
+        moved = [m for m in self.methods
+                 if m['target'] != 'MB8ART.cpp' and (names is None or m['name'] in names)]
+        for method in moved:
+            if 'impl_end' not in method:
+                self.extract_method_implementation(method)
+        moved = [m for m in moved if 'impl_end' in m]
+        
+        # Keep the slices between cuts and join them once; a method's trailing
+        # newlines may overlap the next one's leading blank line, hence max()
+        survivors = []
+        pos = 0
+        for method in sorted(moved, key=lambda m: m['impl_start']):
+            survivors.append(self._view[pos:method['impl_start']])
+            pos = max(pos, method['impl_end'])
+        survivors.append(self._view[pos:])
+        for method in moved:
+            print(f"Removed: {method['name']}")
+        
+        # Clean up multiple blank lines
+        _write_all(self.source_path, _collapse_blank_lines(b''.join(survivors)))
+        print(f"\nRemoved {len(moved)} methods from {self.source_path.name}")
+        return len(moved)
+    
     def generate_removal_script(self):
-        """Generate a script to remove moved methods from original file"""
+        """Generate a wrapper script that removes moved methods from original file"""
         script_path = self.source_dir / 'remove_moved_methods.py'
         
         moved_methods = []
@@ -228,76 +367,32 @@ const TickType_t MB8ART::CACHE_VALIDITY = pdMS_TO_TICKS(1000); // 1 second cache
             if filename != 'MB8ART.cpp':
                 moved_methods.extend([m['name'] for m in methods])
         
-        script_content = f'''#!/usr/bin/env python3
-"""Remove methods that have been moved to split files"""
-
-import re
-
-moved_methods = {moved_methods}
-
-def remove_method(content, method_name):
-    """Remove a method implementation from content"""
-    pattern = rf'((?:[\\w:]+(?:\\s*<[^>]+>)?(?:\\s+|\\s*\\*\\s*))?)(MB8ART::{{re.escape(method_name)}})\s*\\([^{{]]*\\)\\s*(?:const\\s*)?(?:noexcept\\s*)?(?:override\\s*)?\\s*\\{{'
-    
-    matches = list(re.finditer(pattern, content))
-    
-    for match in reversed(matches):
-        start = match.start()
-        
-        # Find preceding comments
-        comment_start = start
-        while comment_start > 0:
-            line_start = content.rfind('\\n', 0, comment_start - 1)
-            if line_start == -1:
-                line_start = 0
-            else:
-                line_start += 1
-            
-            line = content[line_start:comment_start].strip()
-            if line.startswith('//') or line == '':
-                comment_start = line_start
-            else:
-                break
-        
-        # Find matching closing brace
-        brace_count = 1
-        pos = match.end()
+        # Locate the splitter relative to the generated script, not by absolute path
+        splitter_dir = Path(os.path.relpath(Path(__file__).resolve().parent,
+                                            self.source_dir.resolve())).as_posix()
         
-        while pos < len(content) and brace_count > 0:
-            if content[pos] == '{{':
-                brace_count += 1
-            elif content[pos] == '}}':
-                brace_count -= 1
-            pos += 1
-        
-        if brace_count == 0:
-            # Remove extra newlines
-            while pos < len(content) and content[pos] in '\\n\\r':
-                pos += 1
-            content = content[:comment_start] + content[pos:]
-    
-    return content
+        script_content = f'''#!/usr/bin/env python3
+"""Remove methods that have been moved to split files
 
-# Read original file
-with open('src/MB8ART.cpp', 'r') as f:
-    content = f.read()
+Usage: python remove_moved_methods.py [path/to/split_mb8art/dir]
+"""
 
-# Remove each method
-for method in moved_methods:
-    content = remove_method(content, method)
-    print(f"Removed: {{method}}")
+import sys
+from pathlib import Path
 
-# Clean up multiple blank lines
-content = re.sub(r'\\n\\n\\n+', '\\n\\n', content)
+script_dir = Path(__file__).resolve().parent
+splitter_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else script_dir / {splitter_dir!r}
+sys.path.insert(0, str(splitter_dir))
+from split_mb8art import MB8ARTSplitter
 
-# Write back
-with open('src/MB8ART.cpp', 'w') as f:
-    f.write(content)
+moved_methods = {moved_methods}
 
-print(f"\\nRemoved {{len(moved_methods)}} methods from MB8ART.cpp")
+splitter = MB8ARTSplitter(script_dir / {self.source_path.name!r})
+splitter.find_all_methods()
+splitter.remove_moved_methods_inplace(set(moved_methods))
 '''
         
-        script_path.write_text(script_content)
+        _write_all(script_path, script_content.encode())
         script_path.chmod(0o755)
         print(f"\nGenerated removal script: {script_path}")
         
@@ -348,7 +443,7 @@ def main():
     
     # Create backup
     backup_path = Path(source_file + '.backup')
-    backup_path.write_text(splitter.content)
+    _write_all(backup_path, splitter.content)
     print(f"\nCreated backup: {backup_path}")
     
     # Create split files
@@ -366,7 +461,7 @@ def main():
     print("1. Review the generated files")
     print("2. Test compilation: pio run")
     print("3. Fix any compilation errors")
-    print("4. Run: python src/remove_moved_methods.py")
+    print("4. Run: python src/remove_moved_methods.py [path/to/split_mb8art/dir]")
     print("5. Test again and commit changes")
     print("="*60)
 